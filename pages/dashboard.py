@@ -2,17 +2,23 @@
 import streamlit as st
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
+from matplotlib.collections import PolyCollection
 import seaborn as sns
 import pandas as pd
 import numpy as np
 import os
 
+from utils.density import cached_density, density_levels
+from utils.geo import haversine
+from utils.hexgrid import HEX_RESOLUTIONS, cached_hex_index, hex_boundary
+
 # CACHE DATA & PREPROCESSING (FAST & MEMORY SAFE)
+current_dir = os.path.dirname(__file__)
+data_path = os.path.join(current_dir, "..", "data", "clustering_zomato.csv")
+
 @st.cache_data
 def load_dataset():
     """Load dataset once & reuse it (cache)."""
-    current_dir = os.path.dirname(__file__)
-    data_path = os.path.join(current_dir, "..", "data", "clustering_zomato.csv")
     df = pd.read_csv(data_path)
     return df
 
@@ -20,18 +26,6 @@ def load_dataset():
 @st.cache_data
 def compute_distance(df):
     """Precompute Haversine distances and return cached df."""
-    
-    def haversine(lat1, lon1, lat2, lon2):
-        R = 6371
-        phi1, phi2 = np.radians(lat1), np.radians(lat2)
-        dphi = np.radians(lat2 - lat1)
-        dlambda = np.radians(lon2 - lon1)
-        a = (
-            np.sin(dphi/2)**2 +
-            np.cos(phi1) * np.cos(phi2) * np.sin(dlambda/2)**2
-        )
-        return 2 * R * np.arcsin(np.sqrt(a))
-
     df["distance_km"] = haversine(
         df["Restaurant_latitude"],
         df["Restaurant_longitude"],
@@ -43,6 +37,7 @@ def compute_distance(df):
 
 # Load + preprocess
 df_clean = compute_distance(load_dataset())
+data_version = os.path.getmtime(data_path)
 
 # Global color palette
 base_color = "#5f6075"
@@ -83,15 +78,18 @@ The scatter plot shows customer delivery points concentrated mainly around longi
     # Heatmap
     with col2:
         st.markdown("### Delivery Density Heatmap")
+        density, xcenters, ycenters = cached_density(
+            df_clean['Delivery_location_longitude'].to_numpy(),
+            df_clean['Delivery_location_latitude'].to_numpy(),
+            data_version,
+            bw_method=0.3
+        )
         fig, ax = plt.subplots(figsize=(6,5))
-        sns.kdeplot(
-            x=df_clean['Delivery_location_longitude'],
-            y=df_clean['Delivery_location_latitude'],
+        ax.contourf(
+            xcenters, ycenters, density,
+            levels=density_levels(density),
             cmap=custom_cmap,
-            fill=True,
-            bw_method=0.3,
-            alpha=0.8,
-            ax=ax
+            alpha=0.8
         )
         ax.set_xlabel("Longitude")
         ax.set_ylabel("Latitude")
@@ -102,6 +100,33 @@ The scatter plot shows customer delivery points concentrated mainly around longi
         with st.expander("Insight"):
             st.markdown("""
 High-density areas appear around longitude 72–76 and latitude 18–22, indicating major customer hotspots.
+""")
+
+    # Hex aggregates
+    st.markdown(f"### Average Delivery Time by Neighbourhood ({HEX_RESOLUTIONS[1]:.1f} km Hex Cells)")
+    hex_index = cached_hex_index(df_clean, data_version)
+    cells = hex_index[(hex_index['resolution'] == 1) & (hex_index['point_type'] == 'delivery')]
+
+    fig, ax = plt.subplots(figsize=(12,5))
+    hexes = PolyCollection(
+        [hex_boundary(q, r, 1) for q, r in zip(cells['q'], cells['r'])],
+        array=cells['avg_time'].to_numpy(),
+        cmap=custom_cmap,
+        edgecolors="white",
+        linewidths=0.2
+    )
+    ax.add_collection(hexes)
+    ax.autoscale_view()
+    fig.colorbar(hexes, ax=ax, label="Avg Time (min)")
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.set_title("Average Delivery Time per Hex Cell")
+    st.pyplot(fig)
+    plt.close(fig)
+
+    with st.expander("Insight"):
+        st.markdown("""
+Each hex aggregates all orders delivered inside it, so slow neighbourhoods stand out without plotting every delivery point.
 """)
 
     # 2. Distance Analysis
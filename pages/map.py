@@ -1,11 +1,16 @@
 # pages/map.py
 import streamlit as st
 import pandas as pd
+import numpy as np
+import matplotlib.colors as mcolors
 import folium
 from folium.plugins import MarkerCluster
 from streamlit_folium import st_folium
 import os
 
+from utils.density import cached_density, density_levels
+from utils.hexgrid import HEX_RESOLUTIONS, cached_hex_index, cached_hex_geojson
+
 # CACHED LOADING
 @st.cache_data
 def load_clean_data(path):
@@ -22,11 +27,35 @@ summary_path = os.path.join(current_dir, "..", "data", "cluster_summary.csv")
 
 df_clean = load_clean_data(data_path)
 df_summary = load_summary(summary_path)
+data_version = os.path.getmtime(data_path)
+
+# Same palette as the dashboard density heatmap
+heat_cmap = mcolors.LinearSegmentedColormap.from_list(
+    "custom_map",
+    ["#d6d7de", "#a3a4b3", "#5f6075"],
+    N=256
+)
 
 # PAGE FUNCTION
 def map_page():
     st.title("🗺️ Delivery Zone Map with Clusters")
 
+    show_heat = st.checkbox("Show delivery density heat layer", value=False)
+    show_hex = st.checkbox("Show hex aggregate layer", value=False)
+    if show_hex:
+        col1, col2, col3 = st.columns(3)
+        hex_res = col1.selectbox(
+            "Hex Size",
+            options=list(HEX_RESOLUTIONS),
+            index=1,
+            format_func=lambda res: f"{HEX_RESOLUTIONS[res]:.1f} km"
+        )
+        hex_points = col2.selectbox("Locations", options=["delivery", "restaurant"])
+        hex_metric = col3.selectbox(
+            "Metric",
+            options=["avg_time", "p90_time", "order_count", "avg_distance_km"]
+        )
+
     # Center map
     center_lat = df_clean['Delivery_location_latitude'].mean()
     center_lon = df_clean['Delivery_location_longitude'].mean()
@@ -52,6 +81,55 @@ def map_page():
             popup=f"Cluster: {row['kmeans_cluster_features']}"
         ).add_to(marker_cluster)
 
+    # Density heat layer (binned FFT KDE drawn as one image over the grid)
+    if show_heat:
+        density, xcenters, ycenters = cached_density(
+            df_clean['Delivery_location_longitude'].to_numpy(),
+            df_clean['Delivery_location_latitude'].to_numpy(),
+            data_version,
+            bw_method=0.3
+        )
+        dx, dy = xcenters[1] - xcenters[0], ycenters[1] - ycenters[0]
+
+        # Transparent below the lowest contour level, as in the dashboard heatmap
+        image = heat_cmap(density / density.max())
+        image[..., 3] = np.where(density >= density_levels(density)[0], 0.8, 0.0)
+
+        folium.raster_layers.ImageOverlay(
+            image=np.flipud(image),
+            bounds=[
+                [ycenters[0] - dy / 2, xcenters[0] - dx / 2],
+                [ycenters[-1] + dy / 2, xcenters[-1] + dx / 2]
+            ],
+            mercator_project=True,
+            name="Delivery Density"
+        ).add_to(m)
+
+    # Hex aggregate choropleth
+    if show_hex:
+        hex_index = cached_hex_index(df_clean, data_version)
+        cells = hex_index[
+            (hex_index['resolution'] == hex_res) & (hex_index['point_type'] == hex_points)
+        ]
+        choropleth = folium.Choropleth(
+            geo_data=cached_hex_geojson(hex_index, data_version, hex_res, hex_points),
+            data=cells.reset_index(drop=True),
+            columns=['hex_id', hex_metric],
+            key_on='feature.id',
+            fill_color='YlOrRd',
+            fill_opacity=0.6,
+            line_opacity=0.2,
+            legend_name=hex_metric,
+            name="Hex Aggregates"
+        ).add_to(m)
+        folium.GeoJsonTooltip(
+            fields=['hex_id', 'parent_id', 'order_count', 'avg_time', 'p90_time', 'avg_distance_km', 'dominant_cluster'],
+            aliases=['Cell', 'Parent Cell', 'Orders', 'Avg Time (min)', 'P90 Time (min)', 'Avg Distance (km)', 'Dominant Cluster']
+        ).add_to(choropleth.geojson)
+
+    if show_heat or show_hex:
+        folium.LayerControl().add_to(m)
+
     # Display map
     st_folium(m, width=1000, height=550)
 
@@ -2,12 +2,16 @@
 import streamlit as st
 import pandas as pd
 import os
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.cluster import KMeans
 
+from utils.hexgrid import HEX_RESOLUTIONS, cached_hex_index, lookup_hex
+
 # =======================
 # CACHED LOADING
 # =======================
@@ -35,6 +39,135 @@ def build_kmeans(df, _preprocessor):
     model.fit(X)
     return model
 
+VOLUME_LEVELS = ["Low", "Medium", "High"]
+
+def _tertile_levels(values):
+    """Low/Medium/High by percentile rank; tied values share a level."""
+    pct = (values.rank(method='average') - 0.5) / len(values)
+    idx = np.floor(pct * len(VOLUME_LEVELS)).astype(int)
+    return pd.Series(np.array(VOLUME_LEVELS)[idx], index=values.index)
+
+def order_volume_levels(df):
+    """
+    Order volume bucket for each order, relative to its own cluster.
+
+    Days are split into tertiles by the number of orders the cluster received
+    that day, and each order takes its day's level. Falls back to tertiles of
+    `multiple_deliveries` within the cluster when `Order_Date` is not available.
+    """
+    cluster = df['kmeans_cluster_features']
+
+    if 'Order_Date' in df.columns:
+        days = df.groupby(['kmeans_cluster_features', 'Order_Date']).size().rename('orders').reset_index()
+        days['level'] = days.groupby('kmeans_cluster_features')['orders'].transform(_tertile_levels)
+        levels = days.set_index(['kmeans_cluster_features', 'Order_Date'])['level']
+        return pd.Series(
+            levels.reindex(pd.MultiIndex.from_arrays([cluster, df['Order_Date']])).to_numpy(),
+            index=df.index
+        )
+
+    if 'multiple_deliveries' in df.columns:
+        volume = df['multiple_deliveries'].fillna(df['multiple_deliveries'].median())
+        return volume.groupby(cluster).transform(_tertile_levels)
+
+    return pd.Series("All", index=df.index)
+
+@st.cache_data
+def build_delivery_pools(df):
+    """Group empirical delivery times by cluster, volume level and (traffic, weather) condition."""
+    grouped = df.assign(volume_level=order_volume_levels(df)).groupby(
+        ['kmeans_cluster_features', 'volume_level', 'Road_traffic_density', 'Weather_conditions']
+    )['Time_taken (min)']
+
+    pools = {}
+    for (cluster, volume, traffic, weather), times in grouped:
+        pools.setdefault(cluster, {}).setdefault(volume, {})[(traffic, weather)] = times.to_numpy(dtype=np.float64)
+    return pools
+
+
+# =======================
+# SLA BREACH SIMULATOR
+# =======================
+
+def scenario_weights(pools, traffic_share, weather_share):
+    """
+    Cell weights for a target traffic/weather mix.
+
+    Historical cell counts are rescaled so the traffic and weather marginals
+    move towards the requested shares; the historical shares give back the
+    historical mix. Conditions missing from a share dict get zero weight.
+    """
+    counts = pd.Series({cell: len(times) for cell, times in pools.items()}, dtype=np.float64)
+    traffic = counts.index.get_level_values(0)
+    weather = counts.index.get_level_values(1)
+
+    hist_traffic = counts.groupby(traffic).sum() / counts.sum()
+    hist_weather = counts.groupby(weather).sum() / counts.sum()
+
+    weights = (
+        counts
+        * traffic.map(lambda t: traffic_share.get(t, 0.0) / hist_traffic[t]).to_numpy()
+        * weather.map(lambda w: weather_share.get(w, 0.0) / hist_weather[w]).to_numpy()
+    )
+    return weights[weights > 0].to_dict()
+
+
+def _simulate_shifts(seed, n_shifts, n_orders, replicate_rates):
+    """Breach rate of `n_shifts` shifts of `n_orders` orders, each under a random bootstrap replicate."""
+    rng = np.random.default_rng(seed)
+    rates = replicate_rates[rng.integers(0, len(replicate_rates), n_shifts)]
+    return rng.binomial(n_orders, rates) / n_orders
+
+
+def simulate_sla_breach(pools, weights, sla_times, n_orders=100, n_shifts=1_000_000,
+                        n_replicates=2000, seed=42, n_workers=None):
+    """
+    Breach probability for candidate SLA times under a traffic/weather mix.
+
+    `pools` maps (traffic, weather) to empirical delivery times and `weights`
+    maps the same cells to their share of the scenario. The point estimate is
+    the weighted empirical breach rate; the 95% CI comes from bootstrapping
+    each cell's observations, so it widens when a cell has few orders.
+
+    The Monte Carlo part simulates `n_shifts` shifts of `n_orders` orders,
+    each drawn under a bootstrap replicate, to give the P95 shift breach rate
+    including estimation uncertainty. Shift batches run on all cores.
+    """
+    cells = [cell for cell in weights if len(pools.get(cell, ())) and weights[cell] > 0]
+    if not cells:
+        raise ValueError("No delivery times to resample for this scenario.")
+    if n_orders < 1 or n_shifts < 1 or n_replicates < 2:
+        raise ValueError("n_orders and n_shifts must be positive and n_replicates at least 2.")
+
+    sla_times = np.asarray(sla_times, dtype=np.float64)
+    w = np.array([weights[cell] for cell in cells], dtype=np.float64)
+    w /= w.sum()
+    sizes = np.array([len(pools[cell]) for cell in cells], dtype=np.int64)
+    cell_breach = np.array([(pools[cell][:, None] > sla_times).mean(axis=0) for cell in cells])
+
+    # Resampling a cell's n observations with replacement yields Binomial(n, p) breaches
+    rng = np.random.default_rng(seed)
+    boot = rng.binomial(sizes[None, :, None], cell_breach[None], size=(n_replicates,) + cell_breach.shape)
+    replicate_rates = np.einsum('c,bcs->bs', w, boot / sizes[None, :, None])
+
+    n_workers = n_workers or os.cpu_count() or 1
+    batches = [len(b) for b in np.array_split(np.arange(n_shifts), n_workers) if len(b)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        shift_rates = np.concatenate(list(executor.map(
+            lambda args: _simulate_shifts(args[0], args[1], n_orders, replicate_rates),
+            zip(seeds, batches)
+        )))
+
+    return pd.DataFrame({
+        'sla_time': sla_times,
+        'breach_prob': w @ cell_breach,
+        'ci_low': np.percentile(replicate_rates, 2.5, axis=0),
+        'ci_high': np.percentile(replicate_rates, 97.5, axis=0),
+        'shift_p95': np.percentile(shift_rates, 95, axis=0)
+    })
+
 
 # =======================
 # LOAD DATA
@@ -49,6 +182,8 @@ df_summary = load_csv(summary_path)
 
 preprocessor = build_preprocessor()
 kmeans = build_kmeans(df_clean, preprocessor)
+delivery_pools = build_delivery_pools(df_clean)
+hex_index = cached_hex_index(df_clean, os.path.getmtime(data_path))
 
 
 # =======================
@@ -115,6 +250,16 @@ def sla_page():
         sla_pred, cluster_avg, cluster_std = np.nan, np.nan, np.nan
         readable_table = pd.DataFrame()
 
+    # --------------------
+    # NEIGHBOURHOOD LOOKUP
+    # --------------------
+    # Finest hex cell around the input location that has historical orders
+    neighbourhood = None
+    for res in sorted(HEX_RESOLUTIONS, reverse=True):
+        neighbourhood = lookup_hex(hex_index, lat, lon, res)
+        if neighbourhood is not None:
+            break
+
     # --------------------
     # OUTPUT EXPANDER
     # --------------------
@@ -136,6 +281,19 @@ def sla_page():
         st.markdown("### Cluster Details")
         st.table(readable_table)
 
+        st.markdown("### Neighbourhood Details")
+        if neighbourhood is not None:
+            st.markdown(f"""
+            **Hex Cell:** `{neighbourhood['hex_id']}` ({HEX_RESOLUTIONS[neighbourhood['resolution']]:.1f} km)  
+            **Orders:** `{neighbourhood['order_count']}`  
+            **Avg Time:** `{neighbourhood['avg_time']:.2f} min`  
+            **P90 Time:** `{neighbourhood['p90_time']:.2f} min`  
+            **Avg Distance:** `{neighbourhood['avg_distance_km']:.2f} km`  
+            **Dominant Cluster:** `{neighbourhood['dominant_cluster']}`  
+            """)
+        else:
+            st.info("No historical orders near this location.")
+
     with st.expander("How to Use"):
         st.markdown("""
         1. Enter delivery coordinates.  
@@ -143,3 +301,95 @@ def sla_page():
         3. View the predicted SLA in the expander.  
         """)
 
+    # --------------------
+    # SLA BREACH SIMULATOR
+    # --------------------
+    st.subheader("SLA Breach Scenario Simulator")
+
+    st.markdown("""
+    Estimates how often deliveries of a cluster would breach the SLA with an extra buffer,
+    for a chosen order volume and traffic & weather mix. Confidence intervals come from
+    bootstrapping historical orders, so thinly observed conditions get wider intervals.
+    """)
+
+    clusters = sorted(delivery_pools)
+    sim_cluster = st.selectbox(
+        "Cluster",
+        options=clusters,
+        index=clusters.index(cluster_pred) if cluster_pred in clusters else 0
+    )
+    volume_pools = delivery_pools[sim_cluster]
+    volume_options = [v for v in VOLUME_LEVELS + ["All"] if v in volume_pools]
+    sim_volume = st.selectbox(
+        "Order Volume",
+        options=volume_options,
+        help="Daily order volume of the cluster (tertiles of historical days)."
+    )
+    cluster_pools = volume_pools[sim_volume]
+
+    # Historical mix as slider defaults
+    counts = pd.Series({cell: len(times) for cell, times in cluster_pools.items()})
+    hist_traffic = counts.groupby(level=0).sum() / counts.sum()
+    hist_weather = counts.groupby(level=1).sum() / counts.sum()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Traffic Mix (%)**")
+        traffic_share = {
+            t: st.slider(t, 0, 100, int(round(share * 100)), key=f"sim_traffic_{t}")
+            for t, share in hist_traffic.items()
+        }
+    with col2:
+        st.markdown("**Weather Mix (%)**")
+        weather_share = {
+            w: st.slider(w, 0, 100, int(round(share * 100)), key=f"sim_weather_{w}")
+            for w, share in hist_weather.items()
+        }
+
+    buffers = st.multiselect(
+        "SLA Buffers to Compare (min)",
+        options=[0, 2, 5, 10, 15, 20],
+        default=[0, 5, 10]
+    )
+    n_orders = st.number_input("Orders per Shift", min_value=1, max_value=10_000, value=100)
+    n_shifts = st.selectbox(
+        "Simulated Shifts",
+        options=[10_000, 100_000, 1_000_000],
+        index=1,
+        format_func=lambda n: f"{n:,}"
+    )
+
+    if 'sla_time' in df_summary.columns and (df_summary['kmeans_cluster_features'] == sim_cluster).any():
+        base_sla = df_summary.loc[df_summary['kmeans_cluster_features'] == sim_cluster, 'sla_time'].values[0]
+    else:
+        times = np.concatenate(list(cluster_pools.values()))
+        base_sla = times.mean() + times.std()
+
+    weights = scenario_weights(cluster_pools, traffic_share, weather_share)
+    if not weights or not buffers:
+        st.warning("Give at least one traffic level and weather condition a share, and pick an SLA buffer.")
+        return
+
+    start = time.perf_counter()
+    result = simulate_sla_breach(
+        cluster_pools,
+        weights,
+        [base_sla + b for b in sorted(buffers)],
+        n_orders=int(n_orders),
+        n_shifts=int(n_shifts)
+    )
+    elapsed = time.perf_counter() - start
+
+    result.insert(0, 'buffer', sorted(buffers))
+    st.dataframe(result.rename(columns={
+        'buffer': 'Buffer (min)',
+        'sla_time': 'SLA Time (min)',
+        'breach_prob': 'Breach Probability',
+        'ci_low': '95% CI Low',
+        'ci_high': '95% CI High',
+        'shift_p95': 'P95 Shift Breach Rate'
+    }), use_container_width=True)
+    st.caption(
+        f"Based on {int(counts.sum()):,} historical orders; "
+        f"simulated {int(n_shifts):,} shifts ({int(n_shifts) * int(n_orders):,} orders) in {elapsed:.2f} s"
+    )
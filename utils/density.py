@@ -0,0 +1,119 @@
+# utils/density.py
+import streamlit as st
+import numpy as np
+
+# =======================
+# BINNING
+# =======================
+
+def bin_points(x, y, gridsize=256, bw_method=0.3, cut=3):
+    """
+    Bin coordinates onto a fixed grid once.
+
+    The grid extends `cut` kernel bandwidths past the data (as seaborn's
+    kdeplot does) so the density fades out inside the frame. Returns the
+    count grid (rows = y, cols = x), the bin edges and the kernel covariance,
+    which is None when the points are too few or collinear to smooth.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    cov = np.cov(x, y) * bw_method ** 2 if len(x) > 1 else np.full((2, 2), np.nan)
+    bandwidth = np.sqrt(np.diag(cov))
+    if not np.isfinite(cov).all() or np.linalg.det(cov) <= 1e-12 * np.prod(np.diag(cov)):
+        cov = None
+
+    # Degenerate axes (single point, constant coordinate) fall back to a 1-unit pad
+    x_pad, y_pad = np.where(np.isfinite(bandwidth) & (bandwidth > 0), cut * bandwidth, 1.0)
+    xedges = np.linspace(x.min() - x_pad, x.max() + x_pad, gridsize + 1)
+    yedges = np.linspace(y.min() - y_pad, y.max() + y_pad, gridsize + 1)
+
+    counts, _, _ = np.histogram2d(y, x, bins=[yedges, xedges])
+
+    return {
+        "counts": counts,
+        "xedges": xedges,
+        "yedges": yedges,
+        "cov": cov,
+        "n": len(x)
+    }
+
+
+# =======================
+# FFT CONVOLUTION
+# =======================
+
+def fft_density(bins):
+    """
+    Gaussian KDE on a binned grid via FFT convolution.
+
+    The kernel covariance is the data covariance scaled by `bw_method`, as in
+    `scipy.stats.gaussian_kde`. Cost depends only on the grid size, not on the
+    number of points. Without a usable covariance the normalised counts are
+    returned unsmoothed.
+    """
+    counts = bins["counts"]
+    ny, nx = counts.shape
+    dx = bins["xedges"][1] - bins["xedges"][0]
+    dy = bins["yedges"][1] - bins["yedges"][0]
+    norm = max(bins["n"], 1) * dx * dy
+
+    if bins["cov"] is None:
+        return counts / norm
+
+    # Kernel covering every offset on the grid
+    cov = bins["cov"]
+    inv_cov = np.linalg.inv(cov)
+    ox = np.arange(-(nx - 1), nx) * dx
+    oy = np.arange(-(ny - 1), ny) * dy
+    gx, gy = np.meshgrid(ox, oy)
+    quad = inv_cov[0, 0] * gx**2 + 2 * inv_cov[0, 1] * gx * gy + inv_cov[1, 1] * gy**2
+    kernel = np.exp(-0.5 * quad) * dx * dy / (2 * np.pi * np.sqrt(np.linalg.det(cov)))
+
+    # Linear (zero-padded) convolution, cropped back to the grid
+    shape = (counts.shape[0] + kernel.shape[0] - 1, counts.shape[1] + kernel.shape[1] - 1)
+    conv = np.fft.irfft2(
+        np.fft.rfft2(counts, shape) * np.fft.rfft2(kernel, shape), shape
+    )[ny - 1:2 * ny - 1, nx - 1:2 * nx - 1]
+
+    return np.clip(conv, 0, None) / norm
+
+
+def density_levels(density, n_levels=10, thresh=0.05):
+    """Iso-proportion contour levels, matching seaborn's filled kdeplot."""
+    values = np.sort(density.ravel())
+    mass = np.cumsum(values)
+    if mass[-1] > 0:
+        idx = np.searchsorted(mass / mass[-1], np.linspace(thresh, 1, n_levels)).clip(max=len(values) - 1)
+        levels = np.unique(values[idx])
+    else:
+        levels = np.array([0.0])
+
+    # Filled contours need at least two levels (degenerate or tiny point sets)
+    if len(levels) < 2:
+        levels = np.linspace(0, density.max() or 1.0, n_levels)
+    return levels
+
+
+# =======================
+# CACHED ENGINE
+# =======================
+
+@st.cache_data
+def cached_bins(_x, _y, data_version, bw_method=0.3, gridsize=256):
+    """Bin coordinates once per data version and bandwidth (the grid extent depends on it)."""
+    return bin_points(_x, _y, gridsize=gridsize, bw_method=bw_method)
+
+
+@st.cache_data
+def cached_density(_x, _y, data_version, bw_method=0.3, gridsize=256):
+    """
+    Density grid cached per data version and bandwidth.
+
+    Returns the density and the x/y bin centers for plotting.
+    """
+    bins = cached_bins(_x, _y, data_version, bw_method=bw_method, gridsize=gridsize)
+    density = fft_density(bins)
+    xcenters = (bins["xedges"][:-1] + bins["xedges"][1:]) / 2
+    ycenters = (bins["yedges"][:-1] + bins["yedges"][1:]) / 2
+    return density, xcenters, ycenters
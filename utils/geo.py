@@ -0,0 +1,16 @@
+# utils/geo.py
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(lat2 - lat1)
+    dlambda = np.radians(lon2 - lon1)
+    a = (
+        np.sin(dphi/2)**2 +
+        np.cos(phi1) * np.cos(phi2) * np.sin(dlambda/2)**2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
@@ -0,0 +1,227 @@
+# utils/hexgrid.py
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+from utils.geo import EARTH_RADIUS_KM, haversine
+
+# Aperture-7 hierarchy (as in H3): each level divides the edge by sqrt(7) and
+# rotates the grid by atan(sqrt(3)/5), so every parent centre is also a child
+# centre and a parent's 7 children are the centre cell plus its ring. The ring
+# children overhang their parent slightly: about 7% of points fall in a
+# different parent than the one their cell's `parent_id` names.
+APERTURE = 7
+HEX_ROTATION = np.arctan2(np.sqrt(3), 5)
+
+# Hex edge length (km) per resolution
+HEX_RESOLUTIONS = {res: float(20.0 / np.sqrt(APERTURE) ** res) for res in range(4)}
+
+# Fixed projection origin (centre of India) so cell ids are stable across data versions
+ORIGIN_LAT, ORIGIN_LON = 20.0, 78.0
+
+POINT_COLUMNS = {
+    "delivery": ("Delivery_location_latitude", "Delivery_location_longitude"),
+    "restaurant": ("Restaurant_latitude", "Restaurant_longitude"),
+}
+
+
+# =======================
+# HEX GEOMETRY
+# =======================
+
+def _project(lat, lon):
+    """Equirectangular projection to km around the fixed origin."""
+    x = EARTH_RADIUS_KM * np.radians(np.asarray(lon) - ORIGIN_LON) * np.cos(np.radians(ORIGIN_LAT))
+    y = EARTH_RADIUS_KM * np.radians(np.asarray(lat) - ORIGIN_LAT)
+    return x, y
+
+
+def _unproject(x, y):
+    lat = ORIGIN_LAT + np.degrees(y / EARTH_RADIUS_KM)
+    lon = ORIGIN_LON + np.degrees(x / (EARTH_RADIUS_KM * np.cos(np.radians(ORIGIN_LAT))))
+    return lat, lon
+
+
+def _rotate(x, y, angle):
+    return x * np.cos(angle) - y * np.sin(angle), x * np.sin(angle) + y * np.cos(angle)
+
+
+def latlon_to_hex(lat, lon, resolution):
+    """Axial (q, r) coordinates of the pointy-top hex containing each point."""
+    size = HEX_RESOLUTIONS[resolution]
+    x, y = _rotate(*_project(lat, lon), resolution * HEX_ROTATION)
+    qf = (np.sqrt(3) / 3 * x - y / 3) / size
+    rf = (2 / 3 * y) / size
+
+    # Cube rounding
+    sf = -qf - rf
+    q, r, s = np.round(qf), np.round(rf), np.round(sf)
+    dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q = np.where(fix_q, -r - s, q)
+    r = np.where(fix_r, -q - s, r)
+    return q.astype(np.int64), r.astype(np.int64)
+
+
+def hex_center(q, r, resolution):
+    """Lat/lon of hex centres."""
+    size = HEX_RESOLUTIONS[resolution]
+    x = size * np.sqrt(3) * (np.asarray(q) + np.asarray(r) / 2)
+    y = size * 1.5 * np.asarray(r)
+    return _unproject(*_rotate(x, y, -resolution * HEX_ROTATION))
+
+
+def hex_boundary(q, r, resolution):
+    """Closed ring of [lon, lat] vertices for one hex (GeoJSON order)."""
+    size = HEX_RESOLUTIONS[resolution]
+    cx = size * np.sqrt(3) * (q + r / 2)
+    cy = size * 1.5 * r
+    angles = np.radians(30 + 60 * np.arange(7))
+    lat, lon = _unproject(*_rotate(
+        cx + size * np.cos(angles), cy + size * np.sin(angles), -resolution * HEX_ROTATION
+    ))
+    return np.column_stack([lon, lat]).round(6).tolist()
+
+
+def hex_id(resolution, q, r):
+    return f"{resolution}:{q}:{r}"
+
+
+def parent_hex(q, r, resolution):
+    """Axial coordinates of the coarser cell containing each cell's centre."""
+    lat, lon = hex_center(q, r, resolution)
+    return latlon_to_hex(lat, lon, resolution - 1)
+
+
+# =======================
+# INDEX BUILD
+# =======================
+
+def build_hex_index(df, resolutions=None):
+    """
+    Aggregate orders into hex cells for every resolution and point type.
+
+    One row per (resolution, point type, cell) with order count, mean and
+    percentile delivery time, mean distance, the dominant cluster and the id
+    of the parent cell one resolution coarser (empty at the top level).
+    """
+    resolutions = list(HEX_RESOLUTIONS) if resolutions is None else resolutions
+
+    if "distance_km" in df.columns:
+        distance_km = df["distance_km"].to_numpy()
+    else:
+        distance_km = haversine(
+            df["Restaurant_latitude"].to_numpy(),
+            df["Restaurant_longitude"].to_numpy(),
+            df["Delivery_location_latitude"].to_numpy(),
+            df["Delivery_location_longitude"].to_numpy()
+        )
+
+    tables = []
+    for kind, (lat_col, lon_col) in POINT_COLUMNS.items():
+        for res in resolutions:
+            q, r = latlon_to_hex(df[lat_col].to_numpy(), df[lon_col].to_numpy(), res)
+            cells = pd.DataFrame({
+                "q": q,
+                "r": r,
+                "time": df["Time_taken (min)"].to_numpy(),
+                "distance_km": distance_km,
+                "cluster": df["kmeans_cluster_features"].to_numpy()
+            })
+
+            grouped = cells.groupby(["q", "r"])
+            table = grouped.agg(
+                order_count=("time", "size"),
+                avg_time=("time", "mean"),
+                avg_distance_km=("distance_km", "mean")
+            )
+            table["p50_time"] = grouped["time"].quantile(0.5)
+            table["p90_time"] = grouped["time"].quantile(0.9)
+
+            dominant = (
+                cells.groupby(["q", "r", "cluster"]).size()
+                .reset_index(name="n")
+                .sort_values("n", ascending=False)
+                .drop_duplicates(["q", "r"])
+                .set_index(["q", "r"])["cluster"]
+            )
+            table["dominant_cluster"] = dominant
+
+            table = table.reset_index()
+            table.insert(0, "point_type", kind)
+            table.insert(0, "resolution", res)
+            table["lat"], table["lon"] = hex_center(table["q"], table["r"], res)
+            if res - 1 in HEX_RESOLUTIONS:
+                pq, pr = parent_hex(table["q"].to_numpy(), table["r"].to_numpy(), res)
+                table["parent_id"] = [hex_id(res - 1, a, b) for a, b in zip(pq, pr)]
+            else:
+                table["parent_id"] = ""
+            tables.append(table)
+
+    index = pd.concat(tables, ignore_index=True)
+    index["hex_id"] = [hex_id(res, q, r) for res, q, r in zip(index["resolution"], index["q"], index["r"])]
+    return index[[
+        "hex_id", "parent_id", "resolution", "point_type", "q", "r", "lat", "lon",
+        "order_count", "avg_time", "p50_time", "p90_time", "avg_distance_km",
+        "dominant_cluster"
+    ]]
+
+
+@st.cache_resource
+def cached_hex_index(_df, data_version):
+    """
+    Hex index built once per data version, keyed by (point_type, hex_id).
+
+    Cached as a shared resource so the lookup index isn't rebuilt on every
+    rerun; treat it as read-only.
+    """
+    index = build_hex_index(_df).set_index(["point_type", "hex_id"], drop=False).sort_index()
+    # Unnamed levels keep the point_type/hex_id columns unambiguous for groupby
+    return index.rename_axis([None, None])
+
+
+# =======================
+# SERVING
+# =======================
+
+def lookup_hex(index, lat, lon, resolution, point_type="delivery"):
+    """
+    Aggregates for the cell containing (lat, lon), or None if it has no orders.
+
+    Expects the (point_type, hex_id) index from `cached_hex_index`.
+    """
+    q, r = latlon_to_hex(np.array([lat]), np.array([lon]), resolution)
+    key = (point_type, hex_id(resolution, int(q[0]), int(r[0])))
+    return index.loc[key] if key in index.index else None
+
+
+def hex_geojson(index, resolution, point_type="delivery"):
+    """GeoJSON FeatureCollection of hex polygons for a choropleth layer."""
+    cells = index[(index["resolution"] == resolution) & (index["point_type"] == point_type)]
+    features = []
+    for row in cells.itertuples(index=False):
+        features.append({
+            "type": "Feature",
+            "id": row.hex_id,
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [hex_boundary(row.q, row.r, resolution)]
+            },
+            "properties": {
+                "hex_id": row.hex_id,
+                "parent_id": row.parent_id,
+                "order_count": int(row.order_count),
+                "avg_time": round(float(row.avg_time), 2),
+                "p90_time": round(float(row.p90_time), 2),
+                "avg_distance_km": round(float(row.avg_distance_km), 2),
+                "dominant_cluster": int(row.dominant_cluster)
+            }
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+@st.cache_data
+def cached_hex_geojson(_index, data_version, resolution, point_type="delivery"):
+    """GeoJSON layer cached per data version, resolution and point type."""
+    return hex_geojson(_index, resolution, point_type)